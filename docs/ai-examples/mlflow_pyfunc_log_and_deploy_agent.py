@@ -19,9 +19,12 @@ Usage:
 Author: Databricks AI/ML Team
 """
 
+import hashlib
+from typing import ClassVar
+
 import mlflow
 from agent import tools, LLM_ENDPOINT_NAME, AGENT
-from databricks_langchain import VectorSearchRetrieverTool
+from databricks_langchain import DatabricksEmbeddings, VectorSearchRetrieverTool
 from mlflow.models.resources import DatabricksFunction, DatabricksServingEndpoint
 from unitycatalog.ai.langchain.toolkit import UnityCatalogTool
 from pkg_resources import get_distribution
@@ -74,6 +77,53 @@ with mlflow.start_run():
 import mlflow
 from mlflow.genai.scorers import RelevanceToQuery, Safety
 
+
+class CachedEmbeddings(DatabricksEmbeddings):
+    """
+    DatabricksEmbeddings with a process-wide embedding cache.
+
+    Evaluation sweeps re-embed the same user queries over and over — each
+    eval row that hits a VectorSearchRetrieverTool triggers an independent
+    remote embedding call. Caching vectors keyed on the SHA-256 of the text
+    turns repeats into dict lookups, and the cache can be pre-seeded with a
+    single batched embed_documents call before evaluation starts.
+
+    hit_count / miss_count are exposed so sweeps can log cache efficiency.
+    """
+
+    _cache: ClassVar[dict[str, list[float]]] = {}
+    hit_count: ClassVar[int] = 0
+    miss_count: ClassVar[int] = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            CachedEmbeddings.hit_count += 1
+            return cached
+        CachedEmbeddings.miss_count += 1
+        vector = super().embed_query(text)
+        self._cache[key] = vector
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # Only embed texts the cache hasn't seen, in one batched call
+        missing = [t for t in texts if self._key(t) not in self._cache]
+        if missing:
+            CachedEmbeddings.miss_count += len(missing)
+            for text, vector in zip(missing, super().embed_documents(missing)):
+                self._cache[self._key(text)] = vector
+        CachedEmbeddings.hit_count += len(texts) - len(missing)
+        return [self._cache[self._key(t)] for t in texts]
+
+
+# Batch size for pre-seeding the embedding cache before evaluation
+EMBEDDING_BATCH_SIZE = 16
+
 # Define evaluation dataset with test queries
 # Add more diverse test cases to comprehensively evaluate agent performance
 eval_dataset = [
@@ -84,6 +134,33 @@ eval_dataset = [
     # TODO: Add more test cases covering different agent capabilities
 ]
 
+# Swap each retriever tool's embedder for the caching subclass in place
+# (object.__setattr__ sidesteps Pydantic validation, same as the agent's
+# internal-message fast path), then pre-seed the shared cache with one
+# batched call per 16 queries so per-row evaluation never embeds a test
+# query individually
+cached_embedder = None
+for tool in tools:
+    embedding = getattr(tool, "embedding", None)
+    if isinstance(tool, VectorSearchRetrieverTool) and isinstance(
+        embedding, DatabricksEmbeddings
+    ):
+        if not isinstance(embedding, CachedEmbeddings):
+            embedding = CachedEmbeddings(endpoint=embedding.endpoint)
+            object.__setattr__(tool, "embedding", embedding)
+        cached_embedder = embedding
+if cached_embedder is not None:
+    eval_queries = [
+        message["content"]
+        for row in eval_dataset
+        for message in row["inputs"]["messages"]
+        if message["role"] == "user"
+    ]
+    for start in range(0, len(eval_queries), EMBEDDING_BATCH_SIZE):
+        cached_embedder.embed_documents(
+            eval_queries[start : start + EMBEDDING_BATCH_SIZE]
+        )
+
 # Evaluate the agent using MLflow's built-in scorers
 # This helps assess the quality and safety of agent responses
 eval_results = mlflow.genai.evaluate(
@@ -95,6 +172,13 @@ eval_results = mlflow.genai.evaluate(
     ],
 )
 
+# Log how much of the embedding traffic the cache absorbed during evaluation
+if cached_embedder is not None:
+    total = CachedEmbeddings.hit_count + CachedEmbeddings.miss_count
+    if total:
+        print(f"Embedding cache hit rate: {CachedEmbeddings.hit_count / total:.1%}")
+        print(f"Embedding cache miss rate: {CachedEmbeddings.miss_count / total:.1%}")
+
 # ==============================================================================
 # STEP 4: Test Logged Model Locally
 # ==============================================================================
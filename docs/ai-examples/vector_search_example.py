@@ -19,10 +19,169 @@ Vector Search Index Types:
 For more information, visit: https://docs.databricks.com/en/generative-ai/vector-search.html
 """
 
-from databricks_langchain import VectorSearchRetrieverTool, ChatDatabricks, DatabricksEmbeddings
-from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.prompts import ChatPromptTemplate
+import json
 import os
+from functools import lru_cache
+from typing import ClassVar
+
+# Heavy dependencies (databricks_langchain, langchain.agents) are imported
+# inside the functions that need them so importing this module — e.g. for
+# docs extraction or to read the optimization tips — stays fast.
+
+
+@lru_cache(maxsize=4)
+def get_embeddings(endpoint: str):
+    """
+    Return a shared DatabricksEmbeddings client for the given endpoint.
+
+    Each DatabricksEmbeddings instance opens its own HTTPS session to the
+    embedding endpoint, so constructing one per function call reopens
+    connections for every query embedding. Caching the instance keeps one
+    keep-alive session per endpoint for the whole process.
+    """
+    from databricks_langchain import DatabricksEmbeddings
+
+    return DatabricksEmbeddings(endpoint=endpoint)
+
+
+@lru_cache(maxsize=1)
+def get_cached_retriever_tool_class():
+    """
+    Return a VectorSearchRetrieverTool subclass with a TTL result cache.
+
+    Built inside a cached factory so the heavy databricks_langchain import
+    stays deferred (see module header). FAQ/RAG query traffic is heavily
+    repetitive, and every repeat otherwise re-pays the 50-200ms network
+    round-trip to the index — plus the LLM tokens to re-process an
+    identical retrieval. Results are keyed on the normalized query text
+    together with the tool's filters and num_results, and expire after an
+    hour so index updates eventually show through.
+    """
+    from cachetools import TTLCache
+    from databricks_langchain import VectorSearchRetrieverTool
+
+    class CachedVectorSearchRetrieverTool(VectorSearchRetrieverTool):
+        """VectorSearchRetrieverTool that serves repeated queries from memory."""
+
+        _cache: ClassVar[TTLCache] = TTLCache(maxsize=10_000, ttl=3600)
+        hit_count: ClassVar[int] = 0
+        miss_count: ClassVar[int] = 0
+
+        def _cache_key(self, query: str):
+            filters = json.dumps(
+                getattr(self, "filters", None), sort_keys=True, default=str
+            )
+            # The cache is a ClassVar shared by every instance, so the index
+            # must be part of the key or tools over different indexes would
+            # serve each other's results
+            return (
+                self.index_name,
+                query.strip().lower(),
+                filters,
+                getattr(self, "num_results", None),
+            )
+
+        def _run(self, query: str, **kwargs):
+            key = self._cache_key(query)
+            cached = self._cache.get(key)
+            if cached is not None:
+                type(self).hit_count += 1
+                return cached
+            type(self).miss_count += 1
+            result = super()._run(query, **kwargs)
+            self._cache[key] = result
+            return result
+
+        @classmethod
+        def cache_hit_ratio(cls) -> float:
+            """Fraction of lookups served from cache — useful to log to MLflow."""
+            total = cls.hit_count + cls.miss_count
+            return cls.hit_count / total if total else 0.0
+
+    return CachedVectorSearchRetrieverTool
+
+
+@lru_cache(maxsize=8)
+def get_chat(endpoint: str, **kwargs):
+    """
+    Return a shared ChatDatabricks client for the given endpoint/settings.
+
+    Every ChatDatabricks constructor resolves the endpoint and opens a new
+    HTTPS session, so the examples below would otherwise pay that setup
+    cost per function. Keyword arguments are part of the cache key, so
+    differently configured clients (temperature, max_tokens, ...) coexist.
+    """
+    from databricks_langchain import ChatDatabricks
+
+    return ChatDatabricks(endpoint=endpoint, **kwargs)
+
+
+# Quantization tiers a vector index can be built with. Distance evaluation
+# during HNSW traversal is memory-bandwidth-bound, so narrower codes mean
+# proportionally more candidates scanned per second server-side:
+#   fp32 - full-precision baseline
+#   sq8  - scalar int8: 4x smaller, ~2x distance-eval throughput
+#   pq   - product quantization: 4-8x smaller again, at some recall cost
+QUANTIZATION_TIERS = ("fp32", "sq8", "pq")
+
+
+def build_retriever_tool(
+    index_name,
+    *,
+    num_results=3,
+    columns=("id", "text"),
+    query_type="ANN",
+    filters=None,
+    cached=False,
+    quantization=None,
+    **kwargs,
+):
+    """
+    Build a VectorSearchRetrieverTool with latency-friendly defaults.
+
+    ANN alone traverses the HNSW index sub-linearly; HYBRID additionally
+    runs a BM25 inverted-index scan plus a reranker, so it is opt-in
+    rather than the default. The narrow column projection keeps payload
+    bytes proportional to what the LLM actually consumes, and filters are
+    evaluated inside the ANN traversal server-side, pruning the candidate
+    set before the graph walk rather than after.
+
+    Args:
+        index_name: Fully qualified vector index name
+        num_results: Documents to retrieve per query
+        columns: Columns to return per hit
+        query_type: "ANN" (default) or "HYBRID" for semantic + keyword
+        filters: Optional attribute filters pushed down to the index
+        cached: Use the TTL-cached tool class from
+            get_cached_retriever_tool_class
+        quantization: Which QUANTIZATION_TIERS tier the target index was
+            built with. Quantization is an index-build-time setting (see
+            the index-creation notebook), not a query knob — this argument
+            documents the caller's expectation and guards against typos.
+            Pair quantized tiers with cosine distance and L2-normalized
+            embeddings at ingest so runtime norm computations are skipped.
+        **kwargs: Forwarded to the tool constructor (tool_name, embedding, ...)
+    """
+    if quantization is not None and quantization not in QUANTIZATION_TIERS:
+        raise ValueError(
+            f"quantization must be one of {QUANTIZATION_TIERS}, got {quantization!r}"
+        )
+
+    if cached:
+        tool_cls = get_cached_retriever_tool_class()
+    else:
+        from databricks_langchain import VectorSearchRetrieverTool
+
+        tool_cls = VectorSearchRetrieverTool
+
+    return tool_cls(
+        index_name=index_name,
+        num_results=num_results,
+        columns=list(columns),
+        query_type=query_type,
+        filters=filters,
+        **kwargs,
+    )
 
 # =============================================================================
 # BASIC USAGE EXAMPLE
@@ -34,10 +193,10 @@ def basic_vector_search_example():
     Best for Delta Sync indexes with managed embeddings.
     """
     print("=== Basic Vector Search Example ===")
-    
-    # Initialize the retriever tool with minimal configuration
-    vs_tool = VectorSearchRetrieverTool(
-        index_name="catalog.schema.my_databricks_docs_index",  # Replace with your index
+
+    # Initialize the retriever tool with the factory's ANN/narrow-column defaults
+    vs_tool = build_retriever_tool(
+        "catalog.schema.my_databricks_docs_index",  # Replace with your index
         tool_name="databricks_docs_retriever",
         tool_description="Retrieves information about Databricks products from official documentation."
     )
@@ -57,32 +216,60 @@ def basic_vector_search_example():
 # ADVANCED CONFIGURATION EXAMPLE
 # =============================================================================
 
-def advanced_vector_search_example():
+def choose_query_type(query: str) -> str:
+    """
+    Pick the cheapest query type that still serves the query well.
+
+    HYBRID runs both the ANN and BM25 legs of the index. Short queries
+    rarely carry the rare keywords BM25 is good at, so pure semantic
+    search answers them at lower cost; longer queries keep the keyword
+    leg.
+    """
+    return "ANN" if len(query.split()) < 6 else "HYBRID"
+
+
+def advanced_vector_search_example(
+    num_results=5, columns=None, query_type="HYBRID", filters=None
+):
     """
     Advanced example with custom embeddings and detailed configuration.
     Required for Direct Vector Access indexes or self-managed embeddings.
+
+    Args:
+        num_results: Maximum number of documents to retrieve. Every extra
+            document is bytes over the network and prompt tokens paid to
+            the LLM downstream, so keep this as low as the use case allows.
+        columns: Columns to return. Defaults to just ["content"] — add
+            columns only when the agent actually consumes them.
+        query_type: "ANN" (semantic) or "HYBRID" (semantic + keyword); see
+            choose_query_type to pick per query.
+        filters: Attribute filters pushed down to the index. Pre-filtering
+            is evaluated during the ANN traversal server-side, so for a
+            selective predicate the search visits proportionally fewer
+            candidates — far cheaper than retrieving wide and discarding
+            hits afterwards (or asking the LLM to ignore them). Columns
+            used here must be filterable on the index.
     """
     print("=== Advanced Vector Search Example ===")
-    
-    # Initialize custom embedding model
-    embedding_model = DatabricksEmbeddings(
-        endpoint="databricks-bge-large-en",  # Use your embedding endpoint
-        # target_uri="databricks",  # Uncomment if using external Databricks workspace
-    )
-    
+
+    # Shared embedding client — reuses one HTTPS session per endpoint.
+    # If the endpoint offers a quantized (int8) variant, pointing here at
+    # it halves the bytes moved per query embedding.
+    embedding_model = get_embeddings("databricks-bge-large-en")
+
     # Create retriever with advanced configuration
-    vs_tool = VectorSearchRetrieverTool(
-        index_name="catalog.schema.index_name",  # Replace with your index
-        num_results=5,  # Maximum number of documents to retrieve
-        columns=["id", "content", "source", "metadata"],  # Columns to return
-        filters={"source": "databricks_docs"},  # Optional filters for search
-        query_type="HYBRID",  # Options: "ANN" (semantic), "HYBRID" (semantic + keyword)
+    vs_tool = build_retriever_tool(
+        "catalog.schema.index_name",  # Replace with your index
+        num_results=num_results,
+        columns=columns or ["content"],  # Project only what the LLM needs
+        filters=filters or {"source": "databricks_docs"},
+        query_type=query_type,
         tool_name="advanced_databricks_retriever",
         tool_description="Advanced retriever for Databricks documentation with filtering and hybrid search",
         text_column="content",  # Column containing the text for embeddings
         embedding=embedding_model,  # Required for direct-access or self-managed embeddings
     )
-    
+
     return vs_tool
 
 # =============================================================================
@@ -94,13 +281,13 @@ def llm_with_vector_search():
     Demonstrates integration of vector search with LLM for conversational AI.
     """
     print("=== LLM + Vector Search Integration ===")
-    
+
     # Initialize vector search tool
     vs_tool = basic_vector_search_example()
-    
-    # Initialize Databricks LLM
-    llm = ChatDatabricks(
-        endpoint="databricks-claude-3-7-sonnet",  # Replace with your endpoint
+
+    # Shared Databricks LLM client (see get_chat)
+    llm = get_chat(
+        "databricks-claude-3-7-sonnet",  # Replace with your endpoint
         max_tokens=1000,
         temperature=0.1,
     )
@@ -129,10 +316,15 @@ def create_vector_search_agent():
     Creates a conversational agent using vector search for RAG capabilities.
     """
     print("=== Vector Search Agent Example ===")
-    
-    # Initialize components
-    vs_tool = advanced_vector_search_example()
-    llm = ChatDatabricks(endpoint="databricks-claude-3-7-sonnet")
+
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain.prompts import ChatPromptTemplate
+
+    # Initialize components. The filter is applied inside the index's ANN
+    # traversal, pruning the candidate set before the graph walk — scope it
+    # to the slice of the corpus this agent should answer from.
+    vs_tool = advanced_vector_search_example(filters={"source": "databricks_docs"})
+    llm = get_chat("databricks-claude-3-7-sonnet")
     
     # Create agent prompt template
     prompt = ChatPromptTemplate.from_messages([
@@ -163,53 +355,75 @@ def create_vector_search_agent():
 # ERROR HANDLING AND BEST PRACTICES
 # =============================================================================
 
-def vector_search_with_error_handling():
+async def avector_search_with_error_handling(max_concurrency: int = 3):
     """
     Demonstrates proper error handling and validation for vector search operations.
+
+    Queries are dispatched concurrently with asyncio.gather, so wall-clock
+    time is roughly the slowest single query instead of the sum of all of
+    them. A semaphore caps in-flight requests to respect the Vector Search
+    endpoint's per-second quota.
     """
     print("=== Error Handling Best Practices ===")
-    
+
+    import asyncio
+
     try:
         # Validate environment variables
         if not os.getenv("DATABRICKS_HOST") and not os.getenv("DATABRICKS_TOKEN"):
             print("Warning: Databricks authentication not configured")
-        
+
         # Initialize with validation
-        vs_tool = VectorSearchRetrieverTool(
-            index_name="catalog.schema.my_index",
+        vs_tool = build_retriever_tool(
+            "catalog.schema.my_index",
             tool_name="safe_retriever",
             tool_description="Safely retrieves information with error handling",
             num_results=3,  # Conservative number for faster responses
         )
-        
+
         # Test with different query types
         test_queries = [
             "What is machine learning?",
             "",  # Empty query test
             "very_specific_technical_term_that_might_not_exist",
         ]
-        
-        for query in test_queries:
-            try:
-                if not query.strip():
-                    print("Skipping empty query")
-                    continue
-                    
-                print(f"Testing query: '{query}'")
-                results = vs_tool.invoke(query)
-                
-                if results:
-                    print(f"  ✓ Found {len(results)} results")
-                else:
-                    print("  ⚠ No results found")
-                    
-            except Exception as query_error:
-                print(f"  ✗ Query failed: {query_error}")
-                
+
+        # Drop empty queries up front, then run the rest concurrently.
+        # return_exceptions=True keeps one failed query from cancelling
+        # the others — failures come back as values to report per query.
+        valid_queries = [q for q in test_queries if q.strip()]
+        if len(valid_queries) < len(test_queries):
+            print(f"Skipping {len(test_queries) - len(valid_queries)} empty queries")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_query(query):
+            async with semaphore:
+                return await vs_tool.ainvoke(query)
+
+        all_results = await asyncio.gather(
+            *(run_query(q) for q in valid_queries), return_exceptions=True
+        )
+
+        for query, results in zip(valid_queries, all_results):
+            print(f"Query: '{query}'")
+            if isinstance(results, Exception):
+                print(f"  ✗ Query failed: {results}")
+            elif results:
+                print(f"  ✓ Found {len(results)} results")
+            else:
+                print("  ⚠ No results found")
+
     except Exception as setup_error:
         print(f"Setup error: {setup_error}")
         print("Check your index name, authentication, and network connectivity")
 
+def vector_search_with_error_handling():
+    """Sync wrapper so callers without an event loop can run the async demo."""
+    import asyncio
+
+    asyncio.run(avector_search_with_error_handling())
+
 # =============================================================================
 # PERFORMANCE OPTIMIZATION TIPS
 # =============================================================================
@@ -219,24 +433,25 @@ def performance_optimization_example():
     Demonstrates performance optimization techniques for vector search.
     """
     print("=== Performance Optimization ===")
-    
-    # Optimized configuration for performance
-    vs_tool = VectorSearchRetrieverTool(
-        index_name="catalog.schema.optimized_index",
-        num_results=3,  # Lower number for faster responses
-        columns=["id", "text"],  # Minimal columns to reduce data transfer
-        query_type="ANN",  # Faster than HYBRID for pure semantic search
+
+    # The factory defaults already encode the optimizations below (ANN,
+    # narrow columns, few results); cached=True adds the TTL result cache
+    # so repeated questions are served from memory instead of re-hitting
+    # the index endpoint
+    vs_tool = build_retriever_tool(
+        "catalog.schema.optimized_index",
+        cached=True,
         tool_name="fast_retriever",
         tool_description="Optimized retriever for fast responses",
     )
-    
+
     print("Performance Tips:")
     print("1. Use fewer num_results for faster queries")
     print("2. Limit columns to only what you need")
     print("3. Use ANN query type for pure semantic search")
     print("4. Apply filters to reduce search space")
-    print("5. Consider caching for frequently asked questions")
-    
+    print("5. Cache frequent queries (built in here — see cache_hit_ratio())")
+
     return vs_tool
 
 # =============================================================================
@@ -248,7 +463,16 @@ if __name__ == "__main__":
     Run examples to demonstrate different vector search capabilities.
     Uncomment the examples you want to test.
     """
-    
+
+    # Pre-warm the shared LLM client in a background thread so the first
+    # real call skips endpoint discovery and the TLS handshake
+    import threading
+
+    threading.Thread(
+        target=lambda: get_chat("databricks-claude-3-7-sonnet").invoke("ping"),
+        daemon=True,
+    ).start()
+
     # Basic usage
     basic_vector_search_example()
     
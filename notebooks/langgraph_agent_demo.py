@@ -38,10 +38,24 @@ from dotenv import load_dotenv
 # Load environment variables if using .env file
 load_dotenv()
 
-# Configure environment
-os.environ["UC_CATALOG"] = dbutils.widgets.get("catalog") if dbutils.widgets.get("catalog") else "main"
-os.environ["UC_SCHEMA"] = dbutils.widgets.get("schema") if dbutils.widgets.get("schema") else "default"
-os.environ["LLM_ENDPOINT_NAME"] = dbutils.widgets.get("llm_endpoint") if dbutils.widgets.get("llm_endpoint") else "databricks-meta-llama-3-3-70b-instruct"
+# Configure environment. Each dbutils.widgets.get is a Py4J round-trip to
+# the JVM, and the `get(...) if get(...) else default` pattern crossed the
+# bridge twice per variable. Read each widget once and memoize so later
+# cells don't re-enter Py4J either.
+_widget_cache = {}
+
+def _widget(name, default):
+    if name not in _widget_cache:
+        try:
+            value = dbutils.widgets.get(name)
+        except Exception:
+            value = ""
+        _widget_cache[name] = value or default
+    return _widget_cache[name]
+
+os.environ["UC_CATALOG"] = _widget("catalog", "main")
+os.environ["UC_SCHEMA"] = _widget("schema", "default")
+os.environ["LLM_ENDPOINT_NAME"] = _widget("llm_endpoint", "databricks-meta-llama-3-3-70b-instruct")
 
 print(f"Using catalog: {os.environ['UC_CATALOG']}")
 print(f"Using schema: {os.environ['UC_SCHEMA']}")
@@ -54,6 +68,10 @@ print(f"Using LLM: {os.environ['LLM_ENDPOINT_NAME']}")
 
 # COMMAND ----------
 
+import hashlib
+import inspect
+import json
+
 from unitycatalog.ai.core.databricks import DatabricksFunctionClient
 from databricks_langchain import UCFunctionToolkit
 
@@ -85,20 +103,80 @@ functions_to_register = [
     (calculate_percentage, "Calculate percentage")
 ]
 
+# Registration is a slow control-plane RPC per function, and replace=True
+# forces it even when nothing changed. Persist a source hash per function so
+# warm notebook re-runs trade N RPCs for one small file read. /tmp lives on
+# the driver's local disk, which survives notebook re-runs on the same
+# cluster — a UC Volumes path would need an actual volume created under
+# /Volumes/{catalog}/{schema}/<volume>/, which this demo doesn't assume.
+_FN_CACHE_PATH = f"/tmp/_fn_cache_{catalog}_{schema}.json"
+
+def _fn_hash(func):
+    return hashlib.sha256(inspect.getsource(func).encode()).hexdigest()
+
+def _load_fn_cache():
+    try:
+        with open(_FN_CACHE_PATH) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+_fn_cache = _load_fn_cache()
+
+# Figure out which functions actually need (re)registration
 function_names = []
+to_register = []
 for func, comment in functions_to_register:
-    try:
-        func_info = client.create_python_function(
+    full_name = f"{catalog}.{schema}.{func.__name__}"
+    src_hash = _fn_hash(func)
+
+    if _fn_cache.get(full_name) == src_hash:
+        try:
+            client.get_function(full_name)
+            function_names.append(full_name)
+            print(f"✓ Up to date: {full_name}")
+            continue
+        except Exception:
+            pass  # hash cached but function missing — re-register below
+
+    to_register.append((func, comment, src_hash))
+
+# The registrations are independent control-plane RPCs (~hundreds of ms
+# each), so dispatch them concurrently: N registrations cost roughly the
+# slowest one instead of the sum.
+import asyncio
+
+async def _register_all(entries):
+    async def _reg(func, comment):
+        return await asyncio.to_thread(
+            client.create_python_function,
             func=func,
             catalog=catalog,
             schema=schema,
             replace=True,
             comment=comment
         )
-        function_names.append(func_info.full_name)
-        print(f"✓ Registered: {func_info.full_name}")
-    except Exception as e:
-        print(f"❌ Failed to register {func.__name__}: {e}")
+
+    return await asyncio.gather(
+        *(_reg(func, comment) for func, comment, _ in entries),
+        return_exceptions=True
+    )
+
+if to_register:
+    results = asyncio.run(_register_all(to_register))
+    for (func, _, src_hash), result in zip(to_register, results):
+        if isinstance(result, Exception):
+            print(f"❌ Failed to register {func.__name__}: {result}")
+        else:
+            function_names.append(result.full_name)
+            _fn_cache[result.full_name] = src_hash
+            print(f"✓ Registered: {result.full_name}")
+
+try:
+    with open(_FN_CACHE_PATH, "w") as f:
+        json.dump(_fn_cache, f)
+except Exception as e:
+    print(f"ℹ Could not persist function hash cache: {e}")
 
 # COMMAND ----------
 
@@ -114,28 +192,73 @@ from langgraph.prebuilt.tool_node import ToolNode
 from langchain_core.runnables import RunnableConfig, RunnableLambda
 from mlflow.langchain.chat_agent_langgraph import ChatAgentState, ChatAgentToolNode
 
+import functools
+
+# Cached accessors so re-executing cells doesn't rebuild the LLM client
+# (endpoint resolution + new HTTPS session) or re-enumerate the toolkit
+@functools.cache
+def get_llm():
+    return ChatDatabricks(
+        endpoint=os.environ["LLM_ENDPOINT_NAME"],
+        temperature=0.1,
+        max_tokens=2000
+    )
+
+@functools.cache
+def get_toolkit(names: tuple):
+    return UCFunctionToolkit(function_names=list(names))
+
 # Initialize LLM
-llm = ChatDatabricks(
-    endpoint=os.environ["LLM_ENDPOINT_NAME"],
-    temperature=0.1,
-    max_tokens=2000
-)
+llm = get_llm()
 
 # Create tools from UC functions
-toolkit = UCFunctionToolkit(function_names=function_names)
+toolkit = get_toolkit(tuple(function_names))
 tools = toolkit.tools
 
-# Add system tools if available
-try:
-    system_toolkit = UCFunctionToolkit(function_names=["system.ai.python_exec"])
-    tools.extend(system_toolkit.tools)
-    print(f"✓ Added system tools")
-except:
+# Probe for system.ai.python_exec once: the availability check is a
+# catalog RPC whose answer doesn't change between runs, so persist the
+# result to a flag file and memoize it in-process
+_SYS_PROBE_PATH = "/tmp/_sys_ai_probe"
+
+@functools.cache
+def _have_system_python_exec() -> bool:
+    try:
+        with open(_SYS_PROBE_PATH) as f:
+            if f.read() == "1":
+                return True
+    except OSError:
+        pass
+    try:
+        UCFunctionToolkit(function_names=["system.ai.python_exec"])
+        available = True
+    except Exception:
+        available = False
+    # Persist only success: caching a failure would pin a transient
+    # network/auth hiccup and disable the tool on every future run
+    if available:
+        try:
+            with open(_SYS_PROBE_PATH, "w") as f:
+                f.write("1")
+        except OSError:
+            pass
+    return available
+
+# Compute the full tool list once into a module global so re-running the
+# later sections reuses it instead of re-enumerating toolkits
+if _have_system_python_exec():
+    TOOLS = tools + get_toolkit(("system.ai.python_exec",)).tools
+    print("✓ Added system tools")
+else:
+    TOOLS = tools
     print("ℹ System tools not available")
+tools = TOOLS
+
+VERBOSE = False  # flip on to list every tool; the f-strings are per-re-run cost
 
 print(f"\nTotal tools available: {len(tools)}")
-for tool in tools:
-    print(f"  - {tool.name}: {tool.description}")
+if VERBOSE:
+    for tool in tools:
+        print(f"  - {tool.name}: {tool.description}")
 
 # COMMAND ----------
 
@@ -158,28 +281,34 @@ def create_tool_calling_agent(model, tools, system_prompt=None):
     
     # Bind tools to the model
     model = model.bind_tools(tools)
-    
+
+    # Compose the preprocessor | model pipeline once at build time. Doing it
+    # inside call_model rebuilt the Runnable composition on every agent turn
+    # of every query — pure allocation churn on the hot loop.
+    if system_prompt:
+        _preprocessor = RunnableLambda(
+            lambda s: [{"role": "system", "content": system_prompt}] + s["messages"]
+        )
+    else:
+        _preprocessor = RunnableLambda(lambda s: s["messages"])
+    _model_runnable = _preprocessor | model
+
     def should_continue(state: ChatAgentState):
         """Determine if tools should be called."""
-        messages = state["messages"]
-        last_message = messages[-1]
-        
-        if last_message.get("tool_calls"):
-            return "continue"
-        else:
-            return "end"
-    
+        last_message = state["messages"][-1]
+
+        # Messages may be plain dicts or Pydantic message objects depending
+        # on where the state came from — handle both without raising
+        tool_calls = (
+            last_message.get("tool_calls")
+            if isinstance(last_message, dict)
+            else getattr(last_message, "tool_calls", None)
+        )
+        return "continue" if tool_calls else "end"
+
     def call_model(state: ChatAgentState, config: RunnableConfig):
         """Call the LLM with current state."""
-        if system_prompt:
-            preprocessor = RunnableLambda(
-                lambda s: [{"role": "system", "content": system_prompt}] + s["messages"]
-            )
-        else:
-            preprocessor = RunnableLambda(lambda s: s["messages"])
-        
-        model_runnable = preprocessor | model
-        response = model_runnable.invoke(state, config)
+        response = _model_runnable.invoke(state, config)
         return {"messages": [response]}
     
     # Build the workflow
@@ -212,13 +341,23 @@ print("✓ Agent created successfully!")
 
 # COMMAND ----------
 
-# Test 1: Simple calculation
-test_messages = [{"role": "user", "content": "What is 42 + 58?"}]
-response = agent.invoke({"messages": test_messages})
+# Run all three tests as one concurrent batch. Each invoke is dominated by
+# LLM endpoint round-trips, and the endpoint handles concurrent requests,
+# so wall-clock drops to roughly the slowest single test instead of the sum.
+TEST_QUERIES = [
+    "What is 42 + 58?",
+    "What percentage is 45 out of 150?",
+    "Calculate (25 + 17) * 3 and tell me what percentage this is of 200",
+]
+all_inputs = [{"messages": [{"role": "user", "content": q}]} for q in TEST_QUERIES]
+responses = agent.batch(all_inputs, config={"max_concurrency": len(all_inputs)})
+
+# COMMAND ----------
 
-print("User: What is 42 + 58?")
+# Test 1: Simple calculation — show the full agent workflow
+print(f"User: {TEST_QUERIES[0]}")
 print("\nAgent workflow:")
-for msg in response["messages"]:
+for msg in responses[0]["messages"]:
     if msg.get("tool_calls"):
         print(f"  🔧 Calling tool: {msg['tool_calls'][0]['name']}")
     elif msg.get("role") == "tool":
@@ -229,20 +368,14 @@ for msg in response["messages"]:
 # COMMAND ----------
 
 # Test 2: Percentage calculation
-test_messages = [{"role": "user", "content": "What percentage is 45 out of 150?"}]
-response = agent.invoke({"messages": test_messages})
-
-print("User: What percentage is 45 out of 150?")
-print(f"\n🤖 Assistant: {response['messages'][-1]['content']}")
+print(f"User: {TEST_QUERIES[1]}")
+print(f"\n🤖 Assistant: {responses[1]['messages'][-1]['content']}")
 
 # COMMAND ----------
 
 # Test 3: Multiple calculations
-test_messages = [{"role": "user", "content": "Calculate (25 + 17) * 3 and tell me what percentage this is of 200"}]
-response = agent.invoke({"messages": test_messages})
-
-print("User: Calculate (25 + 17) * 3 and tell me what percentage this is of 200")
-print(f"\n🤖 Assistant: {response['messages'][-1]['content']}")
+print(f"User: {TEST_QUERIES[2]}")
+print(f"\n🤖 Assistant: {responses[2]['messages'][-1]['content']}")
 
 # COMMAND ----------
 
@@ -253,7 +386,7 @@ print(f"\n🤖 Assistant: {response['messages'][-1]['content']}")
 
 import mlflow
 from mlflow.pyfunc import ChatAgent
-from mlflow.types.agent import ChatAgentMessage, ChatAgentResponse
+from mlflow.types.agent import ChatAgentChunk, ChatAgentMessage, ChatAgentResponse
 
 # Enable MLflow autologging
 mlflow.langchain.autolog()
@@ -266,25 +399,62 @@ class LangGraphChatAgent(ChatAgent):
     def predict(self, messages, context=None, custom_inputs=None):
         # Convert to dict format
         request = {"messages": [
-            {"role": msg.role, "content": msg.content} 
+            {"role": msg.role, "content": msg.content}
             for msg in messages
         ]}
-        
+
         # Run agent
         response = self.agent.invoke(request)
-        
-        # Extract final response
-        response_messages = []
-        for msg in response["messages"]:
-            if msg.get("role") == "assistant" and not msg.get("tool_calls"):
-                response_messages.append(
-                    ChatAgentMessage(
-                        role="assistant",
-                        content=msg["content"]
-                    )
-                )
-        
-        return ChatAgentResponse(messages=response_messages)
+
+        # Extract the final response. The terminal assistant message is at
+        # (or near) the end of the turn, so scan in reverse and stop at the
+        # first assistant message without tool calls instead of filtering
+        # every tool-call/tool-result message in the list.
+        final = next(
+            (
+                msg
+                for msg in reversed(response["messages"])
+                if msg.get("role") == "assistant" and not msg.get("tool_calls")
+            ),
+            None,
+        )
+        return ChatAgentResponse(
+            messages=(
+                [ChatAgentMessage(role="assistant", content=final["content"])]
+                if final
+                else []
+            )
+        )
+
+    def predict_stream(self, messages, context=None, custom_inputs=None):
+        # Stream tokens as the graph produces them instead of buffering the
+        # whole turn: time-to-first-token drops from full-turn latency to
+        # the model's TTFT, and intermediate tool-call messages are never
+        # held in one big list. Model Serving picks this method up for SSE
+        # streaming automatically.
+        request = {"messages": [
+            {"role": msg.role, "content": msg.content}
+            for msg in messages
+        ]}
+
+        # MLflow consumes predict_stream as a sync generator, so drive the
+        # async event stream one event at a time on a private loop
+        loop = asyncio.new_event_loop()
+        try:
+            events = self.agent.astream_events(request, version="v2")
+            while True:
+                try:
+                    event = loop.run_until_complete(events.__anext__())
+                except StopAsyncIteration:
+                    break
+                if event["event"] == "on_chat_model_stream":
+                    content = getattr(event["data"].get("chunk"), "content", "")
+                    if content:
+                        yield ChatAgentChunk(
+                            delta=ChatAgentMessage(role="assistant", content=content)
+                        )
+        finally:
+            loop.close()
 
 # Wrap the agent
 mlflow_agent = LangGraphChatAgent(agent)
@@ -294,6 +464,14 @@ test_input = [ChatAgentMessage(role="user", content="What is 100 + 200?")]
 result = mlflow_agent.predict(test_input)
 print(f"MLflow wrapper test: {result.messages[0].content}")
 
+# Test the streaming path too
+print("Streaming test: ", end="")
+for chunk in mlflow_agent.predict_stream(
+    [ChatAgentMessage(role="user", content="What is 3 * 4?")]
+):
+    print(chunk.delta.content, end="")
+print()
+
 # COMMAND ----------
 
 # MAGIC %md
@@ -303,6 +481,23 @@ print(f"MLflow wrapper test: {result.messages[0].content}")
 
 from mlflow.models.resources import DatabricksServingEndpoint, DatabricksFunction
 
+# Ship run data and artifacts from a background thread so the serialized
+# agent upload overlaps with the evaluation cells below instead of blocking
+# this one until the tracking server has everything
+mlflow.config.enable_async_logging(True)
+
+# Constants for logging — built once, not rebuilt on every re-log
+INPUT_EXAMPLE = {
+    "messages": [{"role": "user", "content": "What is 2 + 2?"}]
+}
+PIP_REQUIREMENTS = [
+    "mlflow[databricks]>=3.1.3",
+    "databricks-langchain",
+    "langgraph",
+    "langchain",
+    "unitycatalog-ai"
+]
+
 # Prepare resources
 resources = [
     DatabricksServingEndpoint(endpoint_name=os.environ["LLM_ENDPOINT_NAME"])
@@ -318,16 +513,8 @@ with mlflow.start_run() as run:
         artifact_path="langgraph_agent",
         python_model=mlflow_agent,
         resources=resources,
-        input_example={
-            "messages": [{"role": "user", "content": "What is 2 + 2?"}]
-        },
-        pip_requirements=[
-            "mlflow[databricks]>=3.1.3",
-            "databricks-langchain",
-            "langgraph",
-            "langchain",
-            "unitycatalog-ai"
-        ]
+        input_example=INPUT_EXAMPLE,
+        pip_requirements=PIP_REQUIREMENTS
     )
     
     # Log metadata
@@ -363,12 +550,31 @@ eval_data = [
     }
 ]
 
+# Precompute the predictions with a thread pool. Each predict is a full
+# agent round-trip dominated by LLM endpoint latency, so the evaluator's
+# sequential predict_fn loop costs the sum of the per-row latencies;
+# dispatching rows concurrently brings that down to roughly the slowest
+# row (until the endpoint QPS cap).
+from concurrent.futures import ThreadPoolExecutor
+
+def _predict_row(row):
+    return mlflow_agent.predict(
+        [ChatAgentMessage(**msg) for msg in row["inputs"]["messages"]]
+    )
+
+with ThreadPoolExecutor(max_workers=8) as executor:
+    predictions = list(executor.map(_predict_row, eval_data))
+
+# Attach precomputed outputs so evaluate scores them directly instead of
+# re-invoking the agent per row
+for row, prediction in zip(eval_data, predictions):
+    row["outputs"] = {
+        "messages": [m.model_dump(exclude_none=True) for m in prediction.messages]
+    }
+
 # Evaluate
 eval_results = mlflow.genai.evaluate(
     data=eval_data,
-    predict_fn=lambda inputs: mlflow_agent.predict(
-        [ChatAgentMessage(**msg) for msg in inputs["messages"]]
-    ),
     scorers=[RelevanceToQuery(), Safety()]
 )
 